@@ -1,16 +1,21 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import pandas as pd
 import numpy as np
+from scipy import sparse
 import io
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
 import joblib
 import logging
 from datetime import datetime
 import uvicorn
 import os
 import json
+import copy
+import uuid
+import sqlite3
+from contextlib import contextmanager
 from pathlib import Path
 
 # Configure logging
@@ -41,10 +46,26 @@ priority_scaler = None
 binary_features = None
 priority_features = None
 
+# Precomputed explainers for feature attributions
+binary_explainer = None
+priority_explainer = None
+
 # Configuration files paths
 CONFIG_FILE = Path("config.json")
 STATS_FILE = Path("stats.json")
 
+# Shared state store (used by every worker process)
+STATE_DB = Path(os.environ.get("KOLANDER_STATE_DB", "kolander_state.db"))
+
+# Rows explained per decision path batch
+EXPLAIN_BATCH_SIZE = 1000
+
+# Number of recent analyses kept for GET /threats/{id}/explain
+EXPLAIN_RETENTION = 20
+
+# Number of uvicorn worker processes
+WORKERS = int(os.environ.get("KOLANDER_WORKERS", "1"))
+
 # Default configurations
 DEFAULT_GROUP_MULTIPLIERS = {
     'executive': 2.5,
@@ -75,111 +96,279 @@ DEFAULT_STATS = {
     'createdAt': datetime.now().isoformat()
 }
 
-# Current configuration (will be loaded from file)
+# Current configuration (will be loaded from the state store)
 current_config = {
     'groupMultipliers': DEFAULT_GROUP_MULTIPLIERS.copy(),
     'analysisSettings': DEFAULT_ANALYSIS_SETTINGS.copy()
 }
 
+# Version of the stored configuration held in current_config
+config_version = 0
+
 # Current statistics
-current_stats = DEFAULT_STATS.copy()
+current_stats = copy.deepcopy(DEFAULT_STATS)
+
+def get_state_connection() -> sqlite3.Connection:
+    """Open a connection to the shared state store"""
+    # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+    return sqlite3.connect(STATE_DB, timeout=30, isolation_level=None)
+
+@contextmanager
+def state_transaction():
+    """Run a read-modify-write on the state store while holding its write lock"""
+    conn = get_state_connection()
+    try:
+        # Only roll back once the transaction is open, so a lock timeout surfaces as is
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+def read_state(conn: sqlite3.Connection, key: str) -> Tuple[Optional[Dict[str, Any]], int]:
+    """Read a state entry and its version"""
+    row = conn.execute("SELECT value, version FROM state WHERE key = ?", (key,)).fetchone()
+    if row is None:
+        return None, 0
+    return json.loads(row[0]), row[1]
+
+def write_state(conn: sqlite3.Connection, key: str, value: Dict[str, Any]) -> int:
+    """Write a state entry, bump its version and return the new version"""
+    conn.execute(
+        "INSERT INTO state (key, value, version) VALUES (?, ?, 1) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value, version = state.version + 1",
+        (key, json.dumps(value, ensure_ascii=False))
+    )
+    return conn.execute("SELECT version FROM state WHERE key = ?", (key,)).fetchone()[0]
+
+def export_json(path: Path, data: Dict[str, Any]):
+    """Atomically mirror a state entry to its JSON file"""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def read_json(path: Path) -> Dict[str, Any]:
+    """Read a JSON file, returning an empty dict if it is missing or invalid"""
+    try:
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.error(f"Error reading {path}: {str(e)}")
+    return {}
+
+def merge_config(loaded_config: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate and merge a stored configuration with defaults"""
+    return {
+        'groupMultipliers': {
+            **DEFAULT_GROUP_MULTIPLIERS,
+            **loaded_config.get('groupMultipliers', {})
+        },
+        'analysisSettings': {
+            **DEFAULT_ANALYSIS_SETTINGS,
+            **loaded_config.get('analysisSettings', {})
+        }
+    }
+
+def merge_stats(loaded_stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate and merge stored statistics with defaults"""
+    return {**copy.deepcopy(DEFAULT_STATS), **loaded_stats}
+
+def init_state_store():
+    """Create the shared state store, seeding it from the JSON files on first run"""
+    conn = get_state_connection()
+    try:
+        # WAL lets workers read while another one is writing
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, version INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE NOT NULL, data BLOB NOT NULL)"
+        )
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if read_state(conn, 'config')[0] is None:
+                write_state(conn, 'config', merge_config(read_json(CONFIG_FILE)))
+                logger.info("State store seeded with configuration")
+            if read_state(conn, 'stats')[0] is None:
+                write_state(conn, 'stats', merge_stats(read_json(STATS_FILE)))
+                logger.info("State store seeded with statistics")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
 
 def load_config():
-    """Load configuration from JSON file"""
-    global current_config
+    """Load configuration from the state store"""
+    global current_config, config_version
     
     try:
-        if CONFIG_FILE.exists():
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                loaded_config = json.load(f)
-                
-            # Validate and merge with defaults
-            if 'groupMultipliers' in loaded_config:
-                current_config['groupMultipliers'] = {
-                    **DEFAULT_GROUP_MULTIPLIERS,
-                    **loaded_config['groupMultipliers']
-                }
-            
-            if 'analysisSettings' in loaded_config:
-                current_config['analysisSettings'] = {
-                    **DEFAULT_ANALYSIS_SETTINGS,
-                    **loaded_config['analysisSettings']
-                }
-                
-            logger.info("Configuration loaded from config.json")
-        else:
-            logger.info("No config.json found, using default configuration")
-            save_config()  # Create default config file
+        conn = get_state_connection()
+        try:
+            loaded_config, version = read_state(conn, 'config')
+        finally:
+            conn.close()
+        
+        current_config = merge_config(loaded_config or {})
+        config_version = version
+        logger.info(f"Configuration loaded from state store (version {version})")
             
     except Exception as e:
         logger.error(f"Error loading configuration: {str(e)}")
         logger.info("Using default configuration")
-        current_config = {
-            'groupMultipliers': DEFAULT_GROUP_MULTIPLIERS.copy(),
-            'analysisSettings': DEFAULT_ANALYSIS_SETTINGS.copy()
-        }
+        current_config = merge_config({})
 
-def save_config():
-    """Save current configuration to JSON file"""
+def sync_config():
+    """Reload configuration if another worker changed it"""
     try:
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(current_config, f, indent=2, ensure_ascii=False)
-        logger.info("Configuration saved to config.json")
+        conn = get_state_connection()
+        try:
+            row = conn.execute("SELECT version FROM state WHERE key = 'config'").fetchone()
+        finally:
+            conn.close()
+        
+        if row is not None and row[0] != config_version:
+            load_config()
     except Exception as e:
-        logger.error(f"Error saving configuration: {str(e)}")
+        logger.error(f"Error checking configuration version: {str(e)}")
+
+def save_config(apply_changes: Callable[[Dict[str, Any]], None]):
+    """Apply changes to the stored configuration and mirror it to config.json"""
+    global current_config, config_version
+    
+    with state_transaction() as conn:
+        loaded_config, _ = read_state(conn, 'config')
+        config = merge_config(loaded_config or {})
+        apply_changes(config)
+        
+        # Store the merged configuration so every worker holds the same one
+        config = merge_config(config)
+        version = write_state(conn, 'config', config)
+        export_json(CONFIG_FILE, config)
+    
+    current_config = config
+    config_version = version
+    logger.info(f"Configuration saved (version {version})")
 
 def load_stats():
-    """Load statistics from JSON file"""
+    """Load statistics from the state store"""
     global current_stats
     
     try:
-        if STATS_FILE.exists():
-            with open(STATS_FILE, 'r', encoding='utf-8') as f:
-                loaded_stats = json.load(f)
-                
-            # Validate and merge with defaults
-            current_stats = {**DEFAULT_STATS, **loaded_stats}
-            logger.info("Statistics loaded from stats.json")
-        else:
-            logger.info("No stats.json found, using default statistics")
-            save_stats()  # Create default stats file
+        conn = get_state_connection()
+        try:
+            loaded_stats, _ = read_state(conn, 'stats')
+        finally:
+            conn.close()
+        
+        current_stats = merge_stats(loaded_stats or {})
             
     except Exception as e:
         logger.error(f"Error loading statistics: {str(e)}")
-        logger.info("Using default statistics")
-        current_stats = DEFAULT_STATS.copy()
+        logger.info("Using last known statistics")
+    
+    return current_stats
+
+def save_stats(apply_changes: Callable[[Dict[str, Any]], None]):
+    """Apply changes to the stored statistics and mirror them to stats.json"""
+    global current_stats
+    
+    with state_transaction() as conn:
+        loaded_stats, _ = read_state(conn, 'stats')
+        stats = merge_stats(loaded_stats or {})
+        apply_changes(stats)
+        write_state(conn, 'stats', stats)
+        export_json(STATS_FILE, stats)
+    
+    current_stats = stats
+    logger.info("Statistics saved")
 
-def save_stats():
-    """Save current statistics to JSON file"""
+def save_analysis_features(threat_ids: np.ndarray, X_binary_raw: pd.DataFrame,
+                           X_priority_raw: pd.DataFrame) -> str:
+    """Keep the model inputs of an analysis' threats so they can be explained later"""
+    arrays = {'ids': np.asarray(threat_ids, dtype=np.int64)}
+    
+    # Aligned unscaled features are mostly zeros, so they are stored sparse
+    for name, X_raw in [('binary', X_binary_raw), ('priority', X_priority_raw)]:
+        X_sparse = sparse.csr_matrix(X_raw.to_numpy(dtype=np.float64))
+        arrays[f'{name}_data'] = X_sparse.data
+        arrays[f'{name}_indices'] = X_sparse.indices
+        arrays[f'{name}_indptr'] = X_sparse.indptr
+    
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    analysis_id = uuid.uuid4().hex
+    
+    with state_transaction() as conn:
+        conn.execute("INSERT INTO analyses (id, data) VALUES (?, ?)", (analysis_id, buffer.getvalue()))
+        conn.execute(
+            "DELETE FROM analyses WHERE seq <= (SELECT MAX(seq) FROM analyses) - ?",
+            (EXPLAIN_RETENTION,)
+        )
+    
+    return analysis_id
+
+def load_analysis_features(analysis_id: str, threat_id: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Load the unscaled binary and priority features of a threat of an analysis"""
+    conn = get_state_connection()
     try:
-        with open(STATS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(current_stats, f, indent=2, ensure_ascii=False)
-        logger.info("Statistics saved to stats.json")
-    except Exception as e:
-        logger.error(f"Error saving statistics: {str(e)}")
+        row = conn.execute("SELECT data FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+    finally:
+        conn.close()
+    
+    if row is None:
+        return None
+    
+    arrays = np.load(io.BytesIO(row[0]))
+    positions = np.where(arrays['ids'] == threat_id)[0]
+    if len(positions) == 0:
+        return None
+    
+    features = []
+    for name, n_features in [('binary', len(binary_features)), ('priority', len(priority_features))]:
+        X_sparse = sparse.csr_matrix(
+            (arrays[f'{name}_data'], arrays[f'{name}_indices'], arrays[f'{name}_indptr']),
+            shape=(len(arrays['ids']), n_features)
+        )
+        features.append(X_sparse[positions[0]].toarray())
+    
+    return features[0], features[1]
 
 def update_analysis_stats(total_processed: int, threats_detected: int, priority_breakdown: Dict[str, int]):
     """Update analysis statistics"""
-    global current_stats
-    
-    current_stats['totalAnalyses'] += 1
-    current_stats['totalAlertsProcessed'] += total_processed
-    current_stats['totalThreatsDetected'] += threats_detected
-    current_stats['lastAnalysisDate'] = datetime.now().isoformat()
+    def apply_changes(stats: Dict[str, Any]):
+        stats['totalAnalyses'] += 1
+        stats['totalAlertsProcessed'] += total_processed
+        stats['totalThreatsDetected'] += threats_detected
+        stats['lastAnalysisDate'] = datetime.now().isoformat()
+        
+        # Update priority breakdown
+        for priority, count in priority_breakdown.items():
+            if priority in stats['priorityBreakdown']:
+                stats['priorityBreakdown'][priority] += count
     
-    # Update priority breakdown
-    for priority, count in priority_breakdown.items():
-        if priority in current_stats['priorityBreakdown']:
-            current_stats['priorityBreakdown'][priority] += count
-    
-    # Save updated stats
-    save_stats()
+    # Increment atomically so concurrent workers don't clobber each other
+    try:
+        save_stats(apply_changes)
+    except Exception as e:
+        logger.error(f"Error saving statistics: {str(e)}")
     logger.info(f"Statistics updated: {threats_detected} threats detected from {total_processed} records")
 
 def load_models():
     """Load ML models and scalers"""
     global binary_model, priority_model, binary_scaler, priority_scaler
     global binary_features, priority_features
+    global binary_explainer, priority_explainer
     
     models_dir = Path("models")
     
@@ -201,9 +390,115 @@ def load_models():
     except Exception as e:
         logger.error(f"Error loading models: {str(e)}")
         logger.info("Models not found. Please run create_models.py first.")
+        return
+    
+    try:
+        # Explain the threat class and the highest priority class
+        binary_explainer = build_explainer(binary_model, 1)
+        priority_explainer = build_explainer(priority_model, len(priority_model.classes_) - 1)
+        logger.info("Model explainers ready")
+        
+    except Exception as e:
+        logger.error(f"Error building model explainers: {str(e)}")
 
-def preprocess_data_for_binary(df: pd.DataFrame) -> np.ndarray:
-    """Preprocess data for binary classification"""
+def build_explainer(model, class_index: int) -> Dict[str, Any]:
+    """Precompute tree-path contributions and global importances of a RandomForest
+    
+    Each node gets the change in class probability caused by the split leading to it,
+    attributed to the parent's split feature. Summing these along the decision paths
+    of a sample gives its per-feature contributions (bias + contributions = probability).
+    """
+    rows, cols, data = [], [], []
+    bias = 0.0
+    offset = 0
+    
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        values = tree.value[:, 0, :]
+        probs = values[:, class_index] / values.sum(axis=1)
+        
+        # Map every node to its parent
+        parents = np.full(tree.node_count, -1)
+        internal = np.where(tree.children_left != -1)[0]
+        parents[tree.children_left[internal]] = internal
+        parents[tree.children_right[internal]] = internal
+        
+        children = np.where(parents != -1)[0]
+        rows.append(children + offset)
+        cols.append(tree.feature[parents[children]])
+        data.append(probs[children] - probs[parents[children]])
+        
+        bias += probs[0]
+        offset += tree.node_count
+    
+    n_estimators = len(model.estimators_)
+    node_contributions = sparse.csr_matrix(
+        (np.concatenate(data) / n_estimators, (np.concatenate(rows), np.concatenate(cols))),
+        shape=(offset, model.n_features_in_)
+    )
+    # Splits that don't change the probability must not show up as attributions
+    node_contributions.eliminate_zeros()
+    
+    importances = np.asarray(model.feature_importances_)
+    
+    return {
+        'nodeContributions': node_contributions,
+        'bias': bias / n_estimators,
+        'importances': importances,
+        'importanceOrder': np.argsort(-importances)
+    }
+
+def global_importances(explainer: Dict[str, Any], feature_names: List[str], top_n: int) -> List[Dict[str, Any]]:
+    """Get the top-N global feature importances of a model"""
+    return [
+        {'feature': feature_names[j], 'importance': float(explainer['importances'][j])}
+        for j in explainer['importanceOrder'][:top_n]
+    ]
+
+def explain_predictions(model, explainer: Dict[str, Any], X_scaled: np.ndarray, scaler,
+                        feature_names: List[str], top_n: int) -> List[Dict[str, Any]]:
+    """Compute the top-N feature attributions for every row of X_scaled"""
+    explanations = []
+    
+    for start in range(0, X_scaled.shape[0], EXPLAIN_BATCH_SIZE):
+        X_batch = X_scaled[start:start + EXPLAIN_BATCH_SIZE]
+        
+        # One sparse product sums the node contributions along all decision paths
+        indicator, _ = model.decision_path(X_batch)
+        contributions = (indicator @ explainer['nodeContributions']).tocsr()
+        
+        # Select the top-N of the whole batch at once on the dense block
+        dense = contributions.toarray()
+        magnitudes = np.abs(dense)
+        n_top = min(top_n, dense.shape[1])
+        if n_top < dense.shape[1]:
+            top = np.argpartition(-magnitudes, n_top - 1, axis=1)[:, :n_top]
+        else:
+            top = np.tile(np.arange(dense.shape[1]), (dense.shape[0], 1))
+        order = np.argsort(-np.take_along_axis(magnitudes, top, axis=1), axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_values = np.take_along_axis(dense, top, axis=1)
+        top_raw = np.take_along_axis(X_batch, top, axis=1) * scaler.scale_[top] + scaler.mean_[top]
+        
+        for i in range(dense.shape[0]):
+            # Splits that don't move the probability are not attributions
+            explanations.append({
+                'bias': float(explainer['bias']),
+                'topFeatures': [
+                    {
+                        'feature': feature_names[j],
+                        'contribution': float(contribution),
+                        'value': float(value)
+                    }
+                    for j, contribution, value in zip(top[i], top_values[i], top_raw[i])
+                    if contribution != 0
+                ]
+            })
+    
+    return explanations
+
+def align_features_for_binary(df: pd.DataFrame) -> pd.DataFrame:
+    """Align data with the binary model's training features (unscaled)"""
     try:
         # Drop columns that were dropped during training
         drop_cols = [
@@ -224,17 +519,14 @@ def preprocess_data_for_binary(df: pd.DataFrame) -> np.ndarray:
         # Select only the features used during training
         df_processed = df_processed[binary_features]
         
-        # Scale the data
-        X_scaled = binary_scaler.transform(df_processed)
-        
-        return X_scaled
+        return df_processed
         
     except Exception as e:
         logger.error(f"Error in binary preprocessing: {str(e)}")
         raise
 
-def preprocess_data_for_priority(df: pd.DataFrame) -> np.ndarray:
-    """Preprocess data for priority classification"""
+def align_features_for_priority(df: pd.DataFrame) -> pd.DataFrame:
+    """Align data with the priority model's training features (unscaled)"""
     try:
         # Drop columns that were dropped during training
         drop_cols = [
@@ -255,10 +547,7 @@ def preprocess_data_for_priority(df: pd.DataFrame) -> np.ndarray:
         # Select only the features used during training
         df_processed = df_processed[priority_features]
         
-        # Scale the data
-        X_scaled = priority_scaler.transform(df_processed)
-        
-        return X_scaled
+        return df_processed
         
     except Exception as e:
         logger.error(f"Error in priority preprocessing: {str(e)}")
@@ -293,16 +582,28 @@ def safe_int(val, default=0):
         return default
 
 @app.post("/analyze")
-async def analyze_edr_data(file: UploadFile = File(...)):
+def analyze_edr_data(
+    file: UploadFile = File(...),
+    explain: bool = False,
+    top_features: int = Query(5, ge=1, le=50)
+):
     """Analyze uploaded EDR data file using real ML models"""
     try:
         if not binary_model or not priority_model:
             raise HTTPException(status_code=500, detail="ML models not loaded. Please ensure models are trained and available.")
         
+        if explain and (binary_explainer is None or priority_explainer is None):
+            raise HTTPException(status_code=500, detail="Model explainers not available.")
+        
+        # Pick up configuration changes made through other workers, then use one
+        # snapshot for the whole request as other threads may swap current_config
+        sync_config()
+        config = copy.deepcopy(current_config)
+        
         logger.info(f"Received file: {file.filename}")
         
-        # Read uploaded file
-        contents = await file.read()
+        # Read uploaded file (sync handler, run in the threadpool like the state store calls)
+        contents = file.file.read()
         
         # Parse Excel/CSV file
         try:
@@ -318,7 +619,8 @@ async def analyze_edr_data(file: UploadFile = File(...)):
         
         # Step 1: Binary classification (threat detection)
         try:
-            X_binary = preprocess_data_for_binary(df)
+            X_binary_raw = align_features_for_binary(df)
+            X_binary = binary_scaler.transform(X_binary_raw)
             binary_probs = binary_model.predict_proba(X_binary)
             threat_probs = binary_probs[:, 1]  # Probability of being a threat
         except Exception as e:
@@ -326,7 +628,7 @@ async def analyze_edr_data(file: UploadFile = File(...)):
             raise HTTPException(status_code=500, detail=f"Binary classification failed: {str(e)}")
         
         # Filter records predicted as threats
-        binary_threshold = current_config['analysisSettings']['binaryThreshold']
+        binary_threshold = config['analysisSettings']['binaryThreshold']
         threat_mask = threat_probs >= binary_threshold
         threat_indices = np.where(threat_mask)[0]
         
@@ -337,23 +639,55 @@ async def analyze_edr_data(file: UploadFile = File(...)):
             priority_breakdown = {'high': 0, 'medium': 0, 'low': 0}
             update_analysis_stats(len(df), 0, priority_breakdown)
             
-            return JSONResponse({
+            response = {
                 "totalProcessed": len(df),
                 "threatsDetected": 0,
                 "filteredResults": [],
                 "processingTime": "1.2s",
-                "modelVersion": "2.0.0"
-            })
+                "modelVersion": "2.0.0",
+                "analysisId": None
+            }
+            
+            if explain:
+                response["globalFeatureImportances"] = {
+                    "binary": global_importances(binary_explainer, binary_features, top_features),
+                    "priority": global_importances(priority_explainer, priority_features, top_features)
+                }
+            
+            return JSONResponse(response)
         
         # Step 2: Priority classification for detected threats
         try:
             threat_df = df.iloc[threat_indices].copy()
-            X_priority = preprocess_data_for_priority(threat_df)
+            X_priority_raw = align_features_for_priority(threat_df)
+            X_priority = priority_scaler.transform(X_priority_raw)
             priority_probs = priority_model.predict_proba(X_priority)
         except Exception as e:
             logger.error(f"Priority classification error: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Priority classification failed: {str(e)}")
         
+        # Step 3 (opt-in): feature attributions for detected threats
+        if explain:
+            try:
+                threat_explanations = explain_predictions(
+                    binary_model, binary_explainer, X_binary[threat_indices], binary_scaler, binary_features, top_features
+                )
+                priority_explanations = explain_predictions(
+                    priority_model, priority_explainer, X_priority, priority_scaler, priority_features, top_features
+                )
+            except Exception as e:
+                logger.error(f"Explanation error: {str(e)}")
+                raise HTTPException(status_code=500, detail=f"Explanation failed: {str(e)}")
+        
+        # Keep the exact model inputs for GET /threats/{id}/explain
+        try:
+            analysis_id = save_analysis_features(
+                threat_indices, X_binary_raw.iloc[threat_indices], X_priority_raw
+            )
+        except Exception as e:
+            logger.error(f"Error saving analysis features: {str(e)}")
+            analysis_id = None
+        
         # Build results and count priorities
         results = []
         priority_breakdown = {'high': 0, 'medium': 0, 'low': 0}
@@ -382,16 +716,16 @@ async def analyze_edr_data(file: UploadFile = File(...)):
             final_priority_score = base_priority_score
             group_multiplier = 1.0
             
-            if current_config['analysisSettings']['enableGroupModulation']:
+            if config['analysisSettings']['enableGroupModulation']:
                 group = normalize_group_name(row.get('group', 'user'))
-                group_multiplier = current_config['groupMultipliers'].get(group, 1.0)
+                group_multiplier = config['groupMultipliers'].get(group, 1.0)
                 final_priority_score = min(1.0, base_priority_score * group_multiplier)
             else:
                 group = normalize_group_name(row.get('group', 'user'))
             
             # Determine final priority category
-            high_threshold = current_config['analysisSettings']['highPriorityThreshold']
-            medium_threshold = current_config['analysisSettings']['mediumPriorityThreshold']
+            high_threshold = config['analysisSettings']['highPriorityThreshold']
+            medium_threshold = config['analysisSettings']['mediumPriorityThreshold']
             
             if final_priority_score >= high_threshold:
                 final_priority = 'high'
@@ -430,6 +764,13 @@ async def analyze_edr_data(file: UploadFile = File(...)):
                 'ioc_value': str(row.get('ioc_value', 'Unknown')),
                 'feed_name': str(row.get('feed_name', 'Unknown'))
             }
+            
+            if explain:
+                result['explanation'] = {
+                    'threat': threat_explanations[i],
+                    'priority': priority_explanations[i]
+                }
+            
             results.append(result)
         
         # Sort results by priority score (descending)
@@ -440,20 +781,70 @@ async def analyze_edr_data(file: UploadFile = File(...)):
         
         logger.info(f"Analysis complete. Returning {len(results)} threat records")
         
-        return JSONResponse({
+        response = {
             "totalProcessed": len(df),
             "threatsDetected": len(results),
             "filteredResults": results,
             "processingTime": "2.1s",
-            "modelVersion": "2.0.0"
-        })
+            "modelVersion": "2.0.0",
+            "analysisId": analysis_id
+        }
+        
+        if explain:
+            response["globalFeatureImportances"] = {
+                "binary": global_importances(binary_explainer, binary_features, top_features),
+                "priority": global_importances(priority_explainer, priority_features, top_features)
+            }
+        
+        return JSONResponse(response)
         
     except Exception as e:
         logger.error(f"Analysis error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+@app.get("/threats/{threat_id}/explain")
+def explain_threat(
+    threat_id: int,
+    analysis_id: str = Query(..., alias="analysisId"),
+    top_features: int = Query(5, ge=1, le=50)
+):
+    """Explain why a threat of a recent analysis was flagged and prioritized"""
+    if binary_explainer is None or priority_explainer is None:
+        raise HTTPException(status_code=500, detail="Model explainers not available. Please ensure models are trained and available.")
+    
+    features = load_analysis_features(analysis_id, threat_id)
+    if features is None:
+        raise HTTPException(status_code=404, detail=f"Threat {threat_id} not found in analysis {analysis_id}")
+    
+    try:
+        # Same scaling as /analyze, so the model sees exactly the same inputs
+        X_binary = binary_scaler.transform(pd.DataFrame(features[0], columns=binary_features))
+        X_priority = priority_scaler.transform(pd.DataFrame(features[1], columns=priority_features))
+        
+        return JSONResponse({
+            "id": threat_id,
+            "analysisId": analysis_id,
+            "confidence": float(binary_model.predict_proba(X_binary)[0, 1]),
+            "basePriority": float(priority_model.predict_proba(X_priority)[0, -1]),
+            "explanation": {
+                "threat": explain_predictions(
+                    binary_model, binary_explainer, X_binary, binary_scaler, binary_features, top_features
+                )[0],
+                "priority": explain_predictions(
+                    priority_model, priority_explainer, X_priority, priority_scaler, priority_features, top_features
+                )[0]
+            },
+            "globalFeatureImportances": {
+                "binary": global_importances(binary_explainer, binary_features, top_features),
+                "priority": global_importances(priority_explainer, priority_features, top_features)
+            }
+        })
+    except Exception as e:
+        logger.error(f"Error explaining threat {threat_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to explain threat: {str(e)}")
+
 @app.post("/config/priority-rules")
-async def save_priority_rules(rules: List[Dict[str, Any]]):
+def save_priority_rules(rules: List[Dict[str, Any]]):
     """Save priority rules configuration"""
     try:
         # Convert rules list to multipliers dict
@@ -461,8 +852,10 @@ async def save_priority_rules(rules: List[Dict[str, Any]]):
         for rule in rules:
             multipliers[rule['group']] = rule['multiplier']
         
-        current_config['groupMultipliers'] = multipliers
-        save_config()  # Save to file
+        def apply_changes(config: Dict[str, Any]):
+            config['groupMultipliers'] = multipliers
+        
+        save_config(apply_changes)
         
         logger.info(f"Updated group multipliers: {multipliers}")
         
@@ -472,11 +865,13 @@ async def save_priority_rules(rules: List[Dict[str, Any]]):
         raise HTTPException(status_code=500, detail=f"Failed to save priority rules: {str(e)}")
 
 @app.post("/config/analysis-settings")
-async def save_analysis_settings(settings: Dict[str, Any]):
+def save_analysis_settings(settings: Dict[str, Any]):
     """Save analysis settings configuration"""
     try:
-        current_config['analysisSettings'].update(settings)
-        save_config()  # Save to file
+        def apply_changes(config: Dict[str, Any]):
+            config['analysisSettings'].update(settings)
+        
+        save_config(apply_changes)
         
         logger.info(f"Updated analysis settings: {settings}")
         
@@ -486,30 +881,35 @@ async def save_analysis_settings(settings: Dict[str, Any]):
         raise HTTPException(status_code=500, detail=f"Failed to save analysis settings: {str(e)}")
 
 @app.get("/dashboard-stats")
-async def get_dashboard_stats():
+def get_dashboard_stats():
     """Get dashboard statistics"""
     try:
+        # Read the shared totals so every worker reports the same numbers
+        stats = load_stats()
+        
         return JSONResponse({
-            "totalAnalyses": current_stats['totalAnalyses'],
-            "totalAlertsProcessed": current_stats['totalAlertsProcessed'],
-            "totalThreatsDetected": current_stats['totalThreatsDetected'],
-            "priorityBreakdown": current_stats['priorityBreakdown'],
-            "lastAnalysisDate": current_stats['lastAnalysisDate'],
-            "detectionRate": round((current_stats['totalThreatsDetected'] / max(current_stats['totalAlertsProcessed'], 1)) * 100, 2),
-            "averageThreatsPerAnalysis": round(current_stats['totalThreatsDetected'] / max(current_stats['totalAnalyses'], 1), 2)
+            "totalAnalyses": stats['totalAnalyses'],
+            "totalAlertsProcessed": stats['totalAlertsProcessed'],
+            "totalThreatsDetected": stats['totalThreatsDetected'],
+            "priorityBreakdown": stats['priorityBreakdown'],
+            "lastAnalysisDate": stats['lastAnalysisDate'],
+            "detectionRate": round((stats['totalThreatsDetected'] / max(stats['totalAlertsProcessed'], 1)) * 100, 2),
+            "averageThreatsPerAnalysis": round(stats['totalThreatsDetected'] / max(stats['totalAnalyses'], 1), 2)
         })
     except Exception as e:
         logger.error(f"Error getting dashboard stats: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get dashboard stats: {str(e)}")
 
 @app.delete("/dashboard-stats/reset")
-async def reset_dashboard_stats():
+def reset_dashboard_stats():
     """Reset dashboard statistics"""
     try:
-        global current_stats
-        current_stats = DEFAULT_STATS.copy()
-        current_stats['createdAt'] = datetime.now().isoformat()
-        save_stats()
+        def apply_changes(stats: Dict[str, Any]):
+            stats.clear()
+            stats.update(copy.deepcopy(DEFAULT_STATS))
+            stats['createdAt'] = datetime.now().isoformat()
+        
+        save_stats(apply_changes)
         
         logger.info("Dashboard statistics reset")
         return {"success": True, "message": "Statistics reset successfully"}
@@ -526,15 +926,19 @@ async def health_check():
         "modelsLoaded": models_loaded,
         "configLoaded": CONFIG_FILE.exists(),
         "statsLoaded": STATS_FILE.exists(),
+        "stateStore": STATE_DB.exists(),
+        "workerPid": os.getpid(),
         "timestamp": datetime.now().isoformat()
     }
 
 @app.get("/config")
-async def get_config():
+def get_config():
     """Get current configuration"""
+    sync_config()
+    config = current_config
     return {
-        "groupMultipliers": current_config['groupMultipliers'],
-        "analysisSettings": current_config['analysisSettings'],
+        "groupMultipliers": config['groupMultipliers'],
+        "analysisSettings": config['analysisSettings'],
         "modelInfo": {
             "binaryModel": "RandomForestClassifier v2.0" if binary_model else "Not loaded",
             "priorityModel": "RandomForestClassifier v2.0" if priority_model else "Not loaded",
@@ -545,9 +949,14 @@ async def get_config():
 # Load configuration and statistics on startup
 @app.on_event("startup")
 async def startup_event():
+    init_state_store()
     load_config()
     load_stats()
     load_models()
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    if WORKERS > 1:
+        # Multiple workers need the app as an import string
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+import main
+
+
+@pytest.fixture(params=[2, 3])
+def forest(request):
+    """Small RandomForest on scaled data, binary and three-class"""
+    X, y = make_classification(
+        n_samples=300, n_features=12, n_informative=6, n_classes=request.param, random_state=0
+    )
+    scaler = StandardScaler().fit(X)
+    X_scaled = scaler.transform(X)
+    model = RandomForestClassifier(n_estimators=20, random_state=0).fit(X_scaled, y)
+    feature_names = [f"f{j}" for j in range(X.shape[1])]
+    return model, scaler, X_scaled, feature_names
+
+
+def test_contributions_sum_to_predict_proba(forest, monkeypatch):
+    model, scaler, X_scaled, feature_names = forest
+    class_index = len(model.classes_) - 1
+    # Several batches, the last one partial
+    monkeypatch.setattr(main, "EXPLAIN_BATCH_SIZE", 64)
+
+    explainer = main.build_explainer(model, class_index)
+    explanations = main.explain_predictions(
+        model, explainer, X_scaled, scaler, feature_names, top_n=len(feature_names)
+    )
+
+    totals = [e['bias'] + sum(f['contribution'] for f in e['topFeatures']) for e in explanations]
+    np.testing.assert_allclose(totals, model.predict_proba(X_scaled)[:, class_index], atol=1e-9)
+
+
+def test_top_features_are_nonzero_and_sorted(forest):
+    model, scaler, X_scaled, feature_names = forest
+    explainer = main.build_explainer(model, 1)
+
+    for top_n in (3, len(feature_names)):
+        explanations = main.explain_predictions(model, explainer, X_scaled, scaler, feature_names, top_n)
+        for explanation in explanations:
+            contributions = [f['contribution'] for f in explanation['topFeatures']]
+            assert len(contributions) <= top_n
+            assert all(c != 0 for c in contributions)
+            assert contributions == sorted(contributions, key=abs, reverse=True)
+
+
+def test_top_features_report_unscaled_values(forest):
+    model, scaler, X_scaled, feature_names = forest
+    explainer = main.build_explainer(model, 1)
+    X = scaler.inverse_transform(X_scaled)
+
+    explanations = main.explain_predictions(model, explainer, X_scaled[:10], scaler, feature_names, 5)
+    for i, explanation in enumerate(explanations):
+        for feature in explanation['topFeatures']:
+            j = feature_names.index(feature['feature'])
+            assert feature['value'] == pytest.approx(X[i, j])